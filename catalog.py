@@ -0,0 +1,270 @@
+import os
+import sys
+import random
+import shutil
+import tempfile
+from collections import deque
+import numpy as np
+from dfsmaze import WALL, EMPTY
+from mobs import BLOCKED, DOOR, GEM, KEY, MOB
+
+MAGIC = b"MAZECAT1"
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("count", "<u8")])
+INDEX_DTYPE = np.dtype([
+    ("level", "u1"),
+    ("width", "<u2"),
+    ("height", "<u2"),
+    ("mobs", "<u2"),
+    ("path", "<u4"),
+    ("dead_ends", "<u4"),
+    ("key_detour", "<u4"),
+    ("mob_pressure", "<f4"),
+    ("difficulty", "<f4"),
+    ("offset", "<u8"),
+])
+MOB_DTYPE = np.dtype("<i2")
+
+CELLS = [WALL, EMPTY, "S", "E", KEY, DOOR, GEM, MOB]
+CELL_CODES = {cell: code for code, cell in enumerate(CELLS)}
+
+
+def distances(maze, start_x, start_y):
+    """
+    Считает длину кратчайшего пути от клетки до всех остальных клеток лабиринта (поиск в ширину).
+    Двери считаются проходимыми, стены - нет.
+
+    :param maze: Лабиринт в виде двумерного списка
+    :type maze: list[list[str]]
+    :param start_x: Координата x начальной клетки
+    :type start_x: int
+    :param start_y: Координата y начальной клетки
+    :type start_y: int
+    :return: Словарь {(x, y): расстояние} для достижимых клеток
+    :rtype: dict[tuple[int, int], int]
+    """
+    dist = {(start_x, start_y): 0}
+    queue = deque([(start_x, start_y)])
+    while queue:
+        x, y = queue.popleft()
+        for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if (nx, ny) not in dist and 0 <= ny < len(maze) and 0 <= nx < len(maze[0]) \
+                    and maze[ny][nx] != WALL:
+                dist[(nx, ny)] = dist[(x, y)] + 1
+                queue.append((nx, ny))
+    return dist
+
+
+def score_level(maze, mobs):
+    """
+    Оценивает сложность уровня.
+    Метрики:
+    - path: длина кратчайшего пути от старта до выхода с заходом за ключом;
+    - dead_ends: количество тупиков;
+    - key_detour: на сколько клеток заход за ключом удлиняет путь;
+    - mob_pressure: доля проходимых клеток, по которым ходят мобы;
+    - difficulty: path * (1 + mob_pressure) + dead_ends.
+
+    :param maze: Лабиринт в виде двумерного списка
+    :type maze: list[list[str]]
+    :param mobs: Мобы в виде списка словарей {"x", "y", "d"}
+    :type mobs: list[dict]
+    :return: Словарь метрик или None, если выход недостижим
+    :rtype: dict | None
+    """
+    height, width = len(maze), len(maze[0])
+    from_start = distances(maze, 1, 1)
+    from_exit = distances(maze, width - 2, height - 2)
+    if (width - 2, height - 2) not in from_start:
+        return None
+
+    keys = [(x, y) for y in range(height) for x in range(width) if maze[y][x] == KEY]
+    via_key = [from_start[k] + from_exit[k] for k in keys if k in from_start]
+    if not via_key:
+        return None
+    path = min(via_key)
+
+    dead_ends = 0
+    for x, y in from_start:
+        neighbours = [(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)]
+        if sum((nx, ny) in from_start for nx, ny in neighbours) == 1:
+            dead_ends += 1
+
+    swept = set()
+    for mob in mobs:
+        row = maze[mob["y"]]
+        left = right = mob["x"]
+        while left - 1 >= 0 and row[left - 1] not in BLOCKED:
+            left -= 1
+        while right + 1 < width and row[right + 1] not in BLOCKED:
+            right += 1
+        swept.update((x, mob["y"]) for x in range(left, right + 1))
+    mob_pressure = len(swept & from_start.keys()) / len(from_start)
+
+    return {
+        "path": path,
+        "dead_ends": dead_ends,
+        "key_detour": path - from_start[(width - 2, height - 2)],
+        "mob_pressure": mob_pressure,
+        "difficulty": path * (1 + mob_pressure) + dead_ends,
+    }
+
+
+def write_catalog(path, levels):
+    """
+    Записывает уровни в файл каталога.
+    Файл состоит из заголовка, индекса, отсортированного по сложности,
+    и блока данных: клетки лабиринта по одному байту и мобы тройками (x, y, d).
+    Уровни читаются по одному: данные каждого сразу пишутся во временный файл,
+    в памяти остается только индекс.
+
+    :param path: Путь к файлу каталога
+    :type path: str
+    :param levels: Уровни в виде кортежей (уровень, лабиринт, мобы, метрики)
+    :type levels: Iterable[tuple[int, list[list[str]], list[dict], dict]]
+    :return: Количество записанных уровней
+    :rtype: int
+    """
+    rows = []
+    offset = 0
+    with tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(path))) as data:
+        for level, maze, mobs, metrics in levels:
+            cells = np.array([[CELL_CODES[cell] for cell in row] for row in maze], dtype=np.uint8)
+            mob_data = np.array([(mob["x"], mob["y"], mob["d"]) for mob in mobs], dtype=MOB_DTYPE)
+            rows.append((level, len(maze[0]), len(maze), len(mobs), metrics["path"], metrics["dead_ends"],
+                         metrics["key_detour"], metrics["mob_pressure"], metrics["difficulty"], offset))
+            blob = cells.tobytes() + mob_data.tobytes()
+            data.write(blob)
+            offset += len(blob)
+
+        index = np.array(rows, dtype=INDEX_DTYPE)
+        index = index[np.argsort(index["difficulty"], kind="stable")]
+        data.seek(0)
+        with open(path, "wb") as f:
+            f.write(np.array([(MAGIC, len(index))], dtype=HEADER_DTYPE).tobytes())
+            f.write(index.tobytes())
+            shutil.copyfileobj(data, f)
+    return len(index)
+
+
+def open_catalog(path):
+    """
+    Открывает файл каталога через отображение в память, не читая его целиком.
+
+    :param path: Путь к файлу каталога
+    :type path: str
+    :return: Словарь с индексом "index" и блоком данных "data"
+    :rtype: dict[str, numpy.ndarray]
+    :raises ValueError: Если файл не является каталогом уровней
+    """
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+    if header.size == 0 or header[0]["magic"] != MAGIC:
+        raise ValueError(f"{path} is not a level catalog.")
+    count = int(header[0]["count"])
+    data_offset = HEADER_DTYPE.itemsize + count * INDEX_DTYPE.itemsize
+    if count == 0:
+        return {"index": np.zeros(0, dtype=INDEX_DTYPE), "data": np.zeros(0, dtype=np.uint8)}
+    return {
+        "index": np.memmap(path, dtype=INDEX_DTYPE, mode="r", offset=HEADER_DTYPE.itemsize, shape=(count,)),
+        "data": np.memmap(path, dtype=np.uint8, mode="r", offset=data_offset),
+    }
+
+
+def read_level(catalog, i):
+    """
+    Читает уровень с номером i из каталога.
+
+    :param catalog: Каталог, открытый функцией 'open_catalog'
+    :type catalog: dict[str, numpy.ndarray]
+    :param i: Номер записи в индексе
+    :type i: int
+    :return: Лабиринт в виде двумерного списка и мобы в виде списка словарей
+    :rtype: tuple[list[list[str]], list[dict]]
+    """
+    entry = catalog["index"][i]
+    width, height, mobs = int(entry["width"]), int(entry["height"]), int(entry["mobs"])
+    start = int(entry["offset"])
+    cells = catalog["data"][start:start + width * height].reshape(height, width)
+    maze = np.array(CELLS, dtype=object)[cells].tolist()
+    mob_start = start + width * height
+    mob_data = catalog["data"][mob_start:mob_start + mobs * 3 * MOB_DTYPE.itemsize].view(MOB_DTYPE)
+    return maze, [{"x": int(x), "y": int(y), "d": int(d)} for x, y, d in mob_data.reshape(mobs, 3)]
+
+
+def pick_level(catalog, level, low, high):
+    """
+    Выбирает случайный уровень заданного размера со сложностью в диапазоне [low, high].
+
+    :param catalog: Каталог, открытый функцией 'open_catalog'
+    :type catalog: dict[str, numpy.ndarray]
+    :param level: Уровень (1, 2 или 3)
+    :type level: int
+    :param low: Нижняя граница сложности
+    :type low: float
+    :param high: Верхняя граница сложности
+    :type high: float
+    :return: Лабиринт и мобы, как в 'read_level', или None, если подходящего уровня нет
+    :rtype: tuple[list[list[str]], list[dict]] | None
+    """
+    index = catalog["index"]
+    first = np.searchsorted(index["difficulty"], low, side="left")
+    last = np.searchsorted(index["difficulty"], high, side="right")
+    found = np.flatnonzero(index["level"][first:last] == level) + first
+    if found.size == 0:
+        return None
+    return read_level(catalog, int(random.choice(found)))
+
+
+def scored_levels(count, build_level):
+    """
+    Генерирует уровни и оценивает их по одному.
+    Уровни, в которых выход недостижим, отбрасываются.
+
+    :param count: Количество уровней каждого размера
+    :type count: int
+    :param build_level: Функция, создающая лабиринт и мобов для уровня
+    :type build_level: Callable[[int], tuple[list[list[str]], list[dict]]]
+    :return: Уровни в виде кортежей (уровень, лабиринт, мобы, метрики)
+    :rtype: Iterator[tuple[int, list[list[str]], list[dict], dict]]
+    """
+    for level in (1, 2, 3):
+        for _ in range(count):
+            maze, mobs = build_level(level)
+            metrics = score_level(maze, mobs)
+            if metrics is not None:
+                yield level, maze, mobs, metrics
+
+
+def build_catalog(path, count, build_level):
+    """
+    Генерирует уровни, оценивает их и сохраняет в каталог, не держа их все в памяти.
+
+    :param path: Путь к файлу каталога
+    :type path: str
+    :param count: Количество уровней каждого размера
+    :type count: int
+    :param build_level: Функция, создающая лабиринт и мобов для уровня
+    :type build_level: Callable[[int], tuple[list[list[str]], list[dict]]]
+    :return: Количество сохраненных уровней
+    :rtype: int
+    """
+    return write_catalog(path, scored_levels(count, build_level))
+
+
+def main():
+    """
+    Генерирует каталог уровней из командной строки:
+    python catalog.py <файл каталога> <количество уровней каждого размера>
+
+    :return: None
+    """
+    from server import build_level
+
+    if len(sys.argv) != 3:
+        print("Usage: python catalog.py <catalog file> <levels per size>")
+        return
+    saved = build_catalog(sys.argv[1], int(sys.argv[2]), build_level)
+    print(f"Saved {saved} levels to {sys.argv[1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import pytest
+import numpy as np
+from unittest.mock import patch
+import server
+from server import build_level, generate_maze, game_state
+from catalog import score_level, write_catalog, open_catalog, read_level, pick_level, build_catalog
+
+
+@pytest.fixture
+def small_level():
+    maze = [
+        ["\u2588", "\u2588", "\u2588", "\u2588", "\u2588", "\u2588"],
+        ["\u2588", "S", " ", " ", "K", "\u2588"],
+        ["\u2588", " ", "\u2588", "\u2588", "\u2588", "\u2588"],
+        ["\u2588", " ", " ", "M", "\u2591", "\u2588"],
+        ["\u2588", "\u2588", "\u2588", "\u2591", "E", "\u2588"],
+        ["\u2588", "\u2588", "\u2588", "\u2588", "\u2588", "\u2588"],
+    ]
+    mobs = [{"x": 3, "y": 3, "d": 1}]
+    return maze, mobs
+
+
+# Тестирование оценки уровня
+def test_score_level(small_level):
+    maze, mobs = small_level
+    metrics = score_level(maze, mobs)
+    assert metrics["path"] == 12
+    assert metrics["key_detour"] == 6
+    assert metrics["dead_ends"] == 1
+    assert metrics["mob_pressure"] == pytest.approx(3 / 11)
+
+
+def test_score_level_without_reachable_key(small_level):
+    maze, mobs = small_level
+    maze[1][4] = " "
+    assert score_level(maze, mobs) is None
+
+
+def test_score_level_exit_unreachable(small_level):
+    maze, mobs = small_level
+    maze[3][2] = "\u2588"
+    assert score_level(maze, mobs) is None
+
+
+# Тестирование файла каталога
+def test_catalog_round_trip(tmp_path, small_level):
+    maze, mobs = small_level
+    path = str(tmp_path / "levels.cat")
+    levels = [(1, maze, mobs, dict(score_level(maze, mobs), difficulty=d)) for d in (30, 10, 20)]
+    write_catalog(path, levels)
+    catalog = open_catalog(path)
+    assert isinstance(catalog["index"], np.memmap)
+    assert catalog["index"]["difficulty"].tolist() == [10, 20, 30]
+    assert read_level(catalog, 1) == (maze, mobs)
+
+
+def test_catalog_streams_levels(tmp_path, small_level):
+    maze, mobs = small_level
+    path = str(tmp_path / "levels.cat")
+
+    def levels():
+        for d in (30, 10, 20):
+            yield 1, maze, [dict(mobs[0], x=d // 10)], dict(score_level(maze, mobs), difficulty=d)
+
+    assert write_catalog(path, levels()) == 3
+    catalog = open_catalog(path)
+    assert catalog["index"]["difficulty"].tolist() == [10, 20, 30]
+    assert [read_level(catalog, i)[1][0]["x"] for i in range(3)] == [1, 2, 3]
+
+
+def test_pick_level_band(tmp_path):
+    path = str(tmp_path / "levels.cat")
+    assert build_catalog(path, 10, build_level) > 0
+    catalog = open_catalog(path)
+    index = catalog["index"]
+    low, high = float(index["difficulty"][0]), float(index["difficulty"][-1])
+    maze, mobs = pick_level(catalog, 2, low, high)
+    assert len(maze) == 15 and len(maze[0]) == 20
+    assert len(mobs) == 4
+    assert pick_level(catalog, 2, high + 1, high + 2) is None
+
+
+def test_open_catalog_invalid_file(tmp_path):
+    path = tmp_path / "broken.cat"
+    path.write_bytes(b"not a catalog")
+    with pytest.raises(ValueError):
+        open_catalog(str(path))
+
+
+def test_generate_maze_from_catalog(tmp_path, small_level):
+    maze, mobs = small_level
+    path = str(tmp_path / "levels.cat")
+    write_catalog(path, [(1, maze, mobs, score_level(maze, mobs))])
+    game_state["players"] = {
+        1: {"x": 1, "y": 1, "lives": 3, "keys": 0, "gems": 0},
+        2: {"x": 1, "y": 1, "lives": 3, "keys": 0, "gems": 0}
+    }
+    with patch.object(server, "CATALOG_PATH", path), patch.dict(server.level_catalog, {"data": None}):
+        assert generate_maze(1, (0, 100)) == maze
+        assert game_state["mobs"]["x"].tolist() == [3]
+        assert len(generate_maze(1, (500, 600))) == 10
+
+
+@pytest.mark.parametrize("difficulty", [None, (0,), (0, 100, 200), ("0", 100), (0, float("nan")), 5, "ab"])
+def test_generate_maze_rejects_bad_difficulty(tmp_path, small_level, difficulty):
+    maze, mobs = small_level
+    path = str(tmp_path / "levels.cat")
+    write_catalog(path, [(1, maze, mobs, score_level(maze, mobs))])
+    with patch.object(server, "CATALOG_PATH", path), patch.dict(server.level_catalog, {"data": None}), \
+            patch.dict(game_state, {"players": {1: {"x": 1, "y": 1}, 2: {"x": 1, "y": 1}}}):
+        assert len(generate_maze(1, difficulty)) == 10
@@ -0,0 +1,196 @@
+import numpy as np
+from dfsmaze import WALL, EMPTY
+
+DOOR = '\u2591'
+GEM = '\u25C7'
+KEY = 'K'
+MOB = 'M'
+
+BLOCKED = (WALL, DOOR, GEM, KEY)
+
+
+def as_mob_arrays(mobs):
+    """
+    Приводит мобов к виду массивов NumPy.
+    Принимает как список словарей {"x", "y", "d"}, так и уже готовые массивы.
+
+    :param mobs: Мобы в виде списка словарей или словаря массивов
+    :type mobs: list[dict] | dict[str, numpy.ndarray]
+    :return: Словарь с массивами координат "x", "y" и направлений "d"
+    :rtype: dict[str, numpy.ndarray]
+    """
+    if isinstance(mobs, dict):
+        return mobs
+    return {
+        "x": np.array([mob["x"] for mob in mobs], dtype=np.int64),
+        "y": np.array([mob["y"] for mob in mobs], dtype=np.int64),
+        "d": np.array([mob["d"] for mob in mobs], dtype=np.int64),
+    }
+
+
+def as_mob_list(mobs):
+    """
+    Приводит мобов к виду списка словарей {"x", "y", "d"}, в котором они передаются клиентам.
+
+    :param mobs: Мобы в виде словаря массивов или списка словарей
+    :type mobs: dict[str, numpy.ndarray] | list[dict]
+    :return: Список словарей с координатами и направлением каждого моба
+    :rtype: list[dict]
+    """
+    if not isinstance(mobs, dict):
+        return [dict(mob) for mob in mobs]
+    return [{"x": x, "y": y, "d": d}
+            for x, y, d in zip(mobs["x"].tolist(), mobs["y"].tolist(), mobs["d"].tolist())]
+
+
+def blocked_mask(maze):
+    """
+    Строит маску клеток, через которые мобы не проходят
+    (стены, двери, алмазы и ключи).
+
+    :param maze: Лабиринт в виде двумерного списка
+    :type maze: list[list[str]]
+    :return: Булева маска размером (высота, ширина)
+    :rtype: numpy.ndarray
+    """
+    return np.isin(np.array(maze, dtype=object), BLOCKED).astype(bool)
+
+
+def refresh_blocked(mask, maze, cells):
+    """
+    Обновляет маску для клеток, которые изменились после хода игрока.
+
+    :param mask: Маска, построенная функцией 'blocked_mask'
+    :type mask: numpy.ndarray
+    :param maze: Лабиринт в виде двумерного списка
+    :type maze: list[list[str]]
+    :param cells: Координаты измененных клеток в виде пар (x, y)
+    :type cells: Iterable[tuple[int, int]]
+    :return: None
+    """
+    for x, y in cells:
+        mask[y, x] = maze[y][x] in BLOCKED
+
+
+VECTOR_MIN_MOBS = 2000
+
+
+def step_mobs(maze, mobs, mask):
+    """
+    Сдвигает всех мобов на одну клетку.
+    Моб идет в своем направлении по горизонтали и разворачивается,
+    если следующая клетка занята или находится за границей лабиринта.
+    Результат совпадает с последовательной обработкой мобов по порядку:
+    моб стирает свою клетку и ставит "M" на новую, поэтому моб, стоящий раньше в списке,
+    может быть стерт следующим за ним.
+    Пока лабиринт хранится списком строк, запись в него идет поклеточно,
+    и векторный шаг окупается только начиная с VECTOR_MIN_MOBS мобов.
+
+    :param maze: Лабиринт в виде двумерного списка, изменяется на месте
+    :type maze: list[list[str]]
+    :param mobs: Мобы в виде словаря массивов, изменяется на месте
+    :type mobs: dict[str, numpy.ndarray]
+    :param mask: Маска, построенная функцией 'blocked_mask'
+    :type mask: numpy.ndarray
+    :return: Номера строк лабиринта, в которые мобы что-то записали
+    :rtype: set[int]
+    """
+    if mobs["x"].size < VECTOR_MIN_MOBS:
+        return step_mobs_loop(maze, mobs, mask)
+    return step_mobs_vector(maze, mobs, mask)
+
+
+def step_mobs_loop(maze, mobs, mask):
+    """
+    Сдвигает мобов по одному, как 'step_mobs'.
+    Моб, который стоит на месте и уже нарисован, клетку не перезаписывает.
+
+    :param maze: Лабиринт в виде двумерного списка, изменяется на месте
+    :type maze: list[list[str]]
+    :param mobs: Мобы в виде словаря массивов, изменяется на месте
+    :type mobs: dict[str, numpy.ndarray]
+    :param mask: Маска, построенная функцией 'blocked_mask'
+    :type mask: numpy.ndarray
+    :return: Номера строк лабиринта, в которые мобы что-то записали
+    :rtype: set[int]
+    """
+    height, width = mask.shape
+    xs, ys, ds = mobs["x"].tolist(), mobs["y"].tolist(), mobs["d"].tolist()
+    rows = set()
+    for k, y in enumerate(ys):
+        if not 0 <= y < height:
+            ds[k] = -ds[k]
+            continue
+        row = maze[y]
+        x = xs[k]
+        new_x = x + ds[k]
+        if 0 <= new_x < width and row[new_x] not in BLOCKED:
+            if 0 <= x < width:
+                row[x] = EMPTY
+            x = xs[k] = new_x
+        else:
+            ds[k] = -ds[k]
+            if not 0 <= x < width or row[x] == MOB:
+                continue
+        row[x] = MOB
+        rows.add(y)
+    mobs["x"][:] = xs
+    mobs["d"][:] = ds
+    return rows
+
+
+def step_mobs_vector(maze, mobs, mask):
+    """
+    Сдвигает всех мобов, как 'step_mobs', за одну векторную операцию.
+    В лабиринт записывается только итоговое значение каждой затронутой клетки.
+
+    :param maze: Лабиринт в виде двумерного списка, изменяется на месте
+    :type maze: list[list[str]]
+    :param mobs: Мобы в виде словаря массивов, изменяется на месте
+    :type mobs: dict[str, numpy.ndarray]
+    :param mask: Маска, построенная функцией 'blocked_mask'
+    :type mask: numpy.ndarray
+    :return: Номера строк лабиринта, в которые мобы что-то записали
+    :rtype: set[int]
+    """
+    height, width = mask.shape
+    xs, ys, ds = mobs["x"], mobs["y"], mobs["d"]
+    count = xs.size
+
+    rows_ok = (ys >= 0) & (ys < height)
+    cleared = rows_ok & (xs >= 0) & (xs < width)
+
+    new_xs = xs + ds
+    inside = rows_ok & (new_xs >= 0) & (new_xs < width)
+    free = inside.copy()
+    free[inside] = ~mask[ys[inside], new_xs[inside]]
+
+    old_xs = xs.copy()
+    np.copyto(xs, new_xs, where=free)
+    ds[~free] *= -1
+    placed = rows_ok & (xs >= 0) & (xs < width)
+
+    # Моб с номером k сначала стирает старую клетку (событие 2k),
+    # затем ставит себя на новую (событие 2k + 1); побеждает последнее событие.
+    cells = np.empty(2 * count, dtype=np.int64)
+    cells[0::2] = ys * width + old_xs
+    cells[1::2] = ys * width + xs
+    valid = np.empty(2 * count, dtype=bool)
+    valid[0::2] = cleared
+    valid[1::2] = placed
+    events = np.flatnonzero(valid)
+    cells = cells[events]
+    by_cell = np.argsort(cells, kind="stable")
+    cells, events = cells[by_cell], events[by_cell]
+    last = np.ones(cells.size, dtype=bool)
+    last[:-1] = cells[1:] != cells[:-1]
+    cells, events = cells[last], events[last]
+
+    rows = set()
+    for y, x, placed_mob in zip((cells // width).tolist(), (cells % width).tolist(), (events & 1).tolist()):
+        value = MOB if placed_mob else EMPTY
+        row = maze[y]
+        if row[x] != value:
+            row[x] = value
+            rows.add(y)
+    return rows
@@ -0,0 +1,172 @@
+import os
+import sys
+import time
+import functools
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+INTERVAL = 0.005
+
+lock = threading.Lock()
+local = threading.local()
+
+profiler = {"active": False, "scope": None, "threads": set(), "samples": Counter(), "sampler": None}
+
+
+def profiling_active():
+    """
+    Проверяет, идет ли сейчас сбор профиля.
+
+    :return: True, если профилирование включено
+    :rtype: bool
+    """
+    return profiler["active"]
+
+
+def start_profiling(scope=None, interval=INTERVAL):
+    """
+    Включает сбор профиля: отдельный поток с заданным интервалом снимает стеки потоков,
+    которые выполняют помеченный код. Сами игровые потоки профилировщик не трогает.
+
+    :param scope: Функция без аргументов; если она возвращает False, вызов не профилируется.
+        По умолчанию профилируются все вызовы.
+    :type scope: Callable[[], bool] | None
+    :param interval: Интервал между снимками стеков в секундах
+    :type interval: float
+    :return: None
+    """
+    with lock:
+        if profiler["active"]:
+            return
+        profiler["samples"] = Counter()
+        profiler["scope"] = scope
+        profiler["active"] = True
+        profiler["sampler"] = threading.Thread(target=sample, args=(interval,), daemon=True)
+        profiler["sampler"].start()
+
+
+def stop_profiling(path):
+    """
+    Выключает сбор профиля и сохраняет его в файл в формате collapsed stacks
+    (строка "функция;функция;функция количество_снимков"), который читают flamegraph.pl и speedscope.
+
+    :param path: Путь к файлу профиля
+    :type path: str
+    :return: Путь к файлу или None, если ни одного снимка не было
+    :rtype: str | None
+    """
+    with lock:
+        profiler["active"] = False
+        sampler = profiler["sampler"]
+        profiler["sampler"] = None
+    if sampler is not None:
+        sampler.join()
+
+    samples = profiler["samples"]
+    if not samples:
+        return None
+    with open(path, "w") as f:
+        for stack, count in sorted(samples.items()):
+            f.write(f"{stack} {count}\n")
+    return path
+
+
+def collapse(frame):
+    """
+    Записывает стек вызовов одной строкой, от корня к текущей функции.
+
+    :param frame: Текущий кадр стека потока
+    :type frame: types.FrameType
+    :return: Стек в виде "файл:функция;файл:функция"
+    :rtype: str
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def sample(interval):
+    """
+    Цикл потока-сэмплера: пока профилирование включено, снимает стеки
+    зарегистрированных потоков.
+
+    :param interval: Интервал между снимками стеков в секундах
+    :type interval: float
+    :return: None
+    """
+    me = threading.get_ident()
+    while profiler["active"]:
+        time.sleep(interval)
+        with lock:
+            idents = [ident for ident in profiler["threads"] if ident != me]
+        frames = sys._current_frames()
+        for ident in idents:
+            frame = frames.get(ident)
+            if frame is not None:
+                profiler["samples"][collapse(frame)] += 1
+
+
+def in_scope():
+    """
+    Проверяет, нужно ли профилировать текущий вызов.
+    Ошибка в функции-фильтре выключает профилирование вызова, но не доходит до игрового кода.
+
+    :return: True, если вызов профилируется
+    :rtype: bool
+    """
+    scope = profiler["scope"]
+    try:
+        return scope is None or bool(scope())
+    except Exception:
+        return False
+
+
+@contextmanager
+def profiled_section():
+    """
+    Профилирует блок кода в текущем потоке, пока профилирование включено:
+    на время блока поток попадает в список потоков, стеки которых снимает сэмплер.
+    Вложенные блоки учитываются один раз.
+
+    :return: Контекстный менеджер
+    """
+    depth = getattr(local, "depth", 0)
+    if depth == 0 and not (profiler["active"] and in_scope()):
+        yield
+        return
+
+    ident = threading.get_ident()
+    local.depth = depth + 1
+    if depth == 0:
+        with lock:
+            profiler["threads"].add(ident)
+    try:
+        yield
+    finally:
+        local.depth = depth
+        if depth == 0:
+            with lock:
+                profiler["threads"].discard(ident)
+
+
+def profiled(func):
+    """
+    Декоратор, профилирующий каждый вызов функции с помощью 'profiled_section'.
+    Когда профилирование выключено, стоимость вызова - одна проверка флага.
+
+    :param func: Профилируемая функция
+    :type func: Callable
+    :return: Обернутая функция
+    :rtype: Callable
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not profiler["active"]:
+            return func(*args, **kwargs)
+        with profiled_section():
+            return func(*args, **kwargs)
+    return wrapper
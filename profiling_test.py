@@ -0,0 +1,123 @@
+import os
+import pytest
+import threading
+import time
+from unittest.mock import patch
+import server
+from server import game_state, process_player_move, toggle_profiling
+from profiling import profiled, profiled_section, profiling_active, start_profiling, stop_profiling, profiler
+from mobs import as_mob_arrays
+
+
+@profiled
+def work(seconds):
+    time.sleep(seconds)
+
+
+@profiled
+def other_work(seconds):
+    time.sleep(seconds)
+
+
+def read_stacks(path):
+    stacks = {}
+    with open(path) as f:
+        for line in f:
+            stack, count = line.rsplit(" ", 1)
+            stacks[stack] = int(count)
+    return stacks
+
+
+def samples_of(stacks, name):
+    return sum(count for stack, count in stacks.items() if stack.endswith(name))
+
+
+@pytest.fixture(autouse=True)
+def profiling_off(tmp_path):
+    yield
+    stop_profiling(str(tmp_path / "cleanup.folded"))
+    profiler["threads"].clear()
+
+
+# Тестирование профилирования
+def test_nothing_recorded_while_off(tmp_path):
+    work(0.02)
+    assert not profiler["threads"]
+    assert stop_profiling(str(tmp_path / "out.folded")) is None
+
+
+def test_profile_saved_as_collapsed_stacks(tmp_path):
+    start_profiling(interval=0.001)
+    assert profiling_active()
+    work(0.05)
+    path = stop_profiling(str(tmp_path / "out.folded"))
+    assert not profiling_active()
+    assert samples_of(read_stacks(path), "profiling_test.py:work") > 0
+    assert not profiler["threads"]
+
+
+def test_two_threads_profiled_at_once(tmp_path):
+    barrier = threading.Barrier(2)
+    errors = []
+
+    def run(func):
+        try:
+            with profiled_section():
+                barrier.wait()
+                func(0.05)
+        except Exception as e:
+            errors.append(e)
+
+    start_profiling(interval=0.001)
+    threads = [threading.Thread(target=run, args=(func,)) for func in (work, other_work)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stacks = read_stacks(stop_profiling(str(tmp_path / "out.folded")))
+    assert errors == []
+    assert samples_of(stacks, "profiling_test.py:work") > 0
+    assert samples_of(stacks, "profiling_test.py:other_work") > 0
+
+
+def test_profile_scope(tmp_path):
+    allowed = {"value": False}
+    start_profiling(lambda: allowed["value"], interval=0.001)
+    work(0.02)
+    assert stop_profiling(str(tmp_path / "out.folded")) is None
+    start_profiling(lambda: allowed["value"], interval=0.001)
+    allowed["value"] = True
+    work(0.02)
+    assert samples_of(read_stacks(stop_profiling(str(tmp_path / "out.folded"))), "work") > 0
+
+
+def test_scope_error_does_not_reach_game_code(tmp_path):
+    start_profiling(lambda: 1 / 0, interval=0.001)
+    work(0.01)
+    assert stop_profiling(str(tmp_path / "out.folded")) is None
+
+
+def test_toggle_profiling_server(tmp_path):
+    game_state["maze"] = [
+        ["\u2588", "\u2588", "\u2588", "\u2588"],
+        ["\u2588", "1", " ", "\u2588"],
+        ["\u2588", "\u2588", "\u2588", "\u2588"]
+    ]
+    game_state["players"] = {1: {"x": 1, "y": 1, "lives": 3, "keys": 0, "gems": 0}}
+    game_state["mobs"] = as_mob_arrays([])
+    path = str(tmp_path / "server.folded")
+    slow_move = lambda *args: time.sleep(0.03)
+    with patch.object(server, "PROFILE_PATH", path), patch("server.apply_move", side_effect=slow_move), \
+            patch("builtins.print"):
+        game_state["codegame"] = 7
+        toggle_profiling()
+        game_state["codegame"] = 8
+        process_player_move(1, "right")
+        toggle_profiling()
+        assert not os.path.exists(path)
+
+        game_state["codegame"] = 7
+        toggle_profiling()
+        process_player_move(1, "right")
+        toggle_profiling()
+    assert any("server.py:process_player_move" in stack for stack in read_stacks(path))
@@ -0,0 +1,340 @@
+import os
+import sys
+import time
+import signal
+import socket
+import pickle
+import threading
+import multiprocessing
+import server
+
+HOST = '0.0.0.0'
+PORT = 65434
+WORKER_HOST = '127.0.0.1'
+lock = threading.Lock()
+
+workers = {}
+
+
+def worker_port(worker_id):
+    """
+    Возвращает порт, который слушает рабочий процесс.
+
+    :param worker_id: Номер рабочего процесса
+    :type worker_id: int
+    :return: Номер порта
+    :rtype: int
+    """
+    return PORT + 1 + worker_id
+
+
+def owner_of(codegame, worker_count):
+    """
+    Определяет рабочий процесс, которому принадлежит игра.
+    Рабочий процесс с номером i выдает только коды игр, дающие остаток i при делении на число процессов.
+
+    :param codegame: Код игры
+    :type codegame: int
+    :param worker_count: Количество рабочих процессов
+    :type worker_count: int
+    :return: Номер рабочего процесса
+    :rtype: int
+    """
+    return int(codegame) % worker_count
+
+
+def run_worker(worker_id, worker_count, reports):
+    """
+    Запускает игровой сервер в рабочем процессе на его собственном порту.
+    О созданной и закончившейся игре сервер сообщает маршрутизатору через канал reports.
+
+    :param worker_id: Номер рабочего процесса
+    :type worker_id: int
+    :param worker_count: Количество рабочих процессов
+    :type worker_count: int
+    :param reports: Канал для сообщений маршрутизатору
+    :type reports: multiprocessing.connection.Connection
+    :return: None
+    """
+    server.WORKER_ID = worker_id
+    server.WORKER_COUNT = worker_count
+    server.router_pipe["conn"] = reports
+    server.main(WORKER_HOST, worker_port(worker_id))
+
+
+def start_worker(worker_id, worker_count):
+    """
+    Запускает рабочий процесс, регистрирует его как свободный
+    и запускает поток, который читает его сообщения.
+    Вызывается с захваченной блокировкой.
+
+    :param worker_id: Номер рабочего процесса
+    :type worker_id: int
+    :param worker_count: Количество рабочих процессов
+    :type worker_count: int
+    :return: None
+    """
+    reports, child_reports = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=run_worker, args=(worker_id, worker_count, child_reports), daemon=True)
+    process.start()
+    child_reports.close()
+    workers[worker_id] = {"process": process, "reports": reports, "busy": False, "codegame": 0, "joined": False}
+    threading.Thread(target=watch_worker, args=(worker_id, worker_count, reports), daemon=True).start()
+
+
+def restart_worker(worker_id, worker_count):
+    """
+    Завершает рабочий процесс вместе с его игрой и запускает на его месте новый, свободный.
+    Вызывается с захваченной блокировкой.
+
+    :param worker_id: Номер рабочего процесса
+    :type worker_id: int
+    :param worker_count: Количество рабочих процессов
+    :type worker_count: int
+    :return: None
+    """
+    worker = workers[worker_id]
+    worker["process"].terminate()
+    worker["process"].join()
+    start_worker(worker_id, worker_count)
+
+
+def watch_worker(worker_id, worker_count, reports):
+    """
+    Читает сообщения рабочего процесса:
+    "game" - запоминает код созданной игры, чтобы пускать в нее только по точному коду;
+    "closed" или завершение процесса - перезапускает процесс, освобождая его для новой игры.
+
+    :param worker_id: Номер рабочего процесса
+    :type worker_id: int
+    :param worker_count: Количество рабочих процессов
+    :type worker_count: int
+    :param reports: Канал, из которого приходят сообщения процесса
+    :type reports: multiprocessing.connection.Connection
+    :return: None
+    """
+    with reports:
+        while True:
+            try:
+                event, codegame = reports.recv()
+            except (EOFError, OSError):
+                event, codegame = "closed", 0
+
+            with lock:
+                worker = workers.get(worker_id)
+                if worker is None or worker["reports"] is not reports:
+                    return
+                if event == "game":
+                    worker["codegame"] = codegame
+                    continue
+                print(f"Worker {worker_id} finished game {worker['codegame']}, restarting")
+                restart_worker(worker_id, worker_count)
+                return
+
+
+def join_code(move):
+    """
+    Возвращает код игры, к которой присоединяется клиент.
+
+    :param move: Первое сообщение клиента
+    :type move: dict
+    :return: Код игры или 0, если клиент создает новую игру
+    :rtype: int
+    """
+    try:
+        return int(move["codegame"])
+    except (TypeError, KeyError, ValueError):
+        return 0
+
+
+def pick_worker(move, worker_count):
+    """
+    Выбирает рабочий процесс для нового подключения по первому сообщению клиента.
+    Если клиент присоединяется к игре, выбирается владелец игры по коду,
+    но только если он жив, в нем идет игра ровно с этим кодом и второй игрок еще не подключен.
+    Для новой игры выбирается свободный процесс; завершившиеся процессы перезапускаются.
+
+    :param move: Первое сообщение клиента
+    :type move: dict
+    :param worker_count: Количество рабочих процессов
+    :type worker_count: int
+    :return: Номер рабочего процесса или None, если подходящего процесса нет
+    :rtype: int | None
+    """
+    codegame = join_code(move)
+
+    with lock:
+        if codegame > 0:
+            worker_id = owner_of(codegame, worker_count)
+            worker = workers[worker_id]
+            if worker["busy"] and worker["codegame"] == codegame and not worker["joined"] \
+                    and worker["process"].is_alive():
+                worker["joined"] = True
+                return worker_id
+            return None
+
+        for worker_id in range(worker_count):
+            if not workers[worker_id]["process"].is_alive():
+                start_worker(worker_id, worker_count)
+            if not workers[worker_id]["busy"]:
+                workers[worker_id]["busy"] = True
+                return worker_id
+    return None
+
+
+def reject_client(conn, addr, move):
+    """
+    Сообщает клиенту, что его не удалось направить в игру, и закрывает игру на его стороне.
+
+    :param conn: Сетевое соединение с клиентом
+    :type conn: socket.socket
+    :param addr: Адрес клиента
+    :type addr: tuple
+    :param move: Первое сообщение клиента
+    :type move: dict
+    :return: None
+    """
+    codegame = join_code(move)
+    if codegame > 0:
+        print(f"Game {codegame} not found for {addr}")
+        message = f"@Game {codegame} not found, the game closed!"
+    else:
+        print(f"No free worker for {addr}")
+        message = "@All game servers are busy, try again later!"
+    conn.sendall(pickle.dumps({"maze": None, "players": {}, "codegame": 0, "message": message}))
+
+
+def connect_worker(worker_id, attempts=50):
+    """
+    Подключается к рабочему процессу, ожидая, пока он начнет слушать порт.
+
+    :param worker_id: Номер рабочего процесса
+    :type worker_id: int
+    :param attempts: Количество попыток подключения
+    :type attempts: int
+    :return: Соединение с рабочим процессом
+    :rtype: socket.socket
+    :raises OSError: Если подключиться не удалось
+    """
+    for _ in range(attempts - 1):
+        try:
+            return socket.create_connection((WORKER_HOST, worker_port(worker_id)))
+        except OSError:
+            time.sleep(0.1)
+    return socket.create_connection((WORKER_HOST, worker_port(worker_id)))
+
+
+def pipe(src, dst):
+    """
+    Пересылает данные из одного соединения в другое до закрытия источника.
+
+    :param src: Соединение-источник
+    :type src: socket.socket
+    :param dst: Соединение-приемник
+    :type dst: socket.socket
+    :return: None
+    """
+    try:
+        while True:
+            data = src.recv(4096)
+            if not data:
+                break
+            dst.sendall(data)
+    except OSError:
+        pass
+    finally:
+        try:
+            dst.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+
+
+def route_client(conn, addr, worker_count):
+    """
+    Направляет клиента в рабочий процесс, которому принадлежит его игра,
+    и пересылает трафик между ними.
+
+    :param conn: Сетевое соединение с клиентом
+    :type conn: socket.socket
+    :param addr: Адрес клиента
+    :type addr: tuple
+    :param worker_count: Количество рабочих процессов
+    :type worker_count: int
+    :return: None
+    """
+    with conn:
+        raw_data = conn.recv(4096)
+        if not raw_data:
+            return
+
+        move = pickle.loads(raw_data)
+        worker_id = pick_worker(move, worker_count)
+        if worker_id is None:
+            reject_client(conn, addr, move)
+            return
+
+        with lock:
+            worker = workers[worker_id]
+        print(f"Client {addr} routed to worker {worker_id} (pid {worker['process'].pid})")
+        try:
+            upstream = connect_worker(worker_id)
+        except OSError as e:
+            print(f"Error: worker {worker_id} is unavailable: {e}")
+            with lock:
+                if workers.get(worker_id) is worker:
+                    restart_worker(worker_id, worker_count)
+            reject_client(conn, addr, move)
+            return
+
+        with upstream:
+            upstream.sendall(raw_data)
+            thread = threading.Thread(target=pipe, args=(upstream, conn))
+            thread.start()
+            pipe(conn, upstream)
+            thread.join()
+
+
+def main(worker_count=None):
+    """
+    Запускает многопроцессный режим сервера:
+    1. Запускает по одному рабочему процессу с игровым сервером на ядро (или указанное количество).
+    2. Слушает общий адрес (HOST) и порт (PORT).
+    3. Каждого подключившегося клиента направляет в процесс, которому принадлежит его игра.
+    Каждый процесс ведет ровно одну игру, и весь трафик игроков идет через маршрутизатор,
+    поэтому одновременно идет не больше игр, чем рабочих процессов.
+    Сигнал SIGUSR1 маршрутизатор игнорирует: профилирование включается в рабочем процессе,
+    pid которого печатается при направлении в него клиента.
+
+    :param worker_count: Количество рабочих процессов, по умолчанию число ядер
+    :type worker_count: int | None
+    :return: None
+    """
+    worker_count = worker_count or os.cpu_count() or 1
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    with lock:
+        for worker_id in range(worker_count):
+            start_worker(worker_id, worker_count)
+
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            s.bind((HOST, PORT))
+            s.listen()
+            print(f"Router listening on {HOST}:{PORT} with {worker_count} workers")
+
+            while True:
+                conn, addr = s.accept()
+                threading.Thread(target=route_client, args=(conn, addr, worker_count), daemon=True).start()
+    except socket.error as e:
+        print(f"Error: Failed to create socket: {e}")
+    finally:
+        with lock:
+            stopped = list(workers.values())
+            workers.clear()
+        for worker in stopped:
+            worker["process"].terminate()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,173 @@
+import pytest
+import pickle
+import signal
+from unittest.mock import Mock, patch
+import server
+import router
+from router import owner_of, pick_worker, route_client, watch_worker, workers
+
+
+def fake_worker():
+    return {"process": Mock(is_alive=Mock(return_value=True)), "reports": Mock(),
+            "busy": False, "codegame": 0, "joined": False}
+
+
+def context_mock():
+    mock = Mock()
+    mock.__enter__ = Mock(return_value=mock)
+    mock.__exit__ = Mock(return_value=None)
+    return mock
+
+
+def client_conn(first_message):
+    conn = context_mock()
+    conn.recv.return_value = pickle.dumps(first_message)
+    return conn
+
+
+@pytest.fixture
+def fake_workers():
+    workers.clear()
+    for worker_id in range(3):
+        workers[worker_id] = fake_worker()
+    yield
+    workers.clear()
+
+
+# Тестирование маршрутизации по коду игры
+@pytest.mark.parametrize("codegame, owner", [(3, 0), (4, 1), (14, 2)])
+def test_owner_of(codegame, owner):
+    assert owner_of(codegame, 3) == owner
+
+
+def test_codegame_owned_by_worker():
+    players = {
+        1: {"x": 1, "y": 1, "lives": 3, "keys": 0, "gems": 0},
+        2: {"x": 1, "y": 1, "lives": 3, "keys": 0, "gems": 0}
+    }
+    with patch.dict(server.game_state, {"players": players}), \
+            patch.object(server, "WORKER_ID", 2), patch.object(server, "WORKER_COUNT", 3):
+        for _ in range(20):
+            server.generate_maze(1)
+            assert owner_of(server.game_state["codegame"], 3) == 2
+
+
+def test_pick_worker_join_goes_to_owner(fake_workers):
+    workers[2].update(busy=True, codegame=8)
+    assert pick_worker({"codegame": 8, "level": 0}, 3) == 2
+    assert workers[2]["joined"]
+    assert not workers[0]["busy"] and not workers[1]["busy"]
+
+
+def test_pick_worker_join_needs_exact_code(fake_workers):
+    workers[2].update(busy=True, codegame=8)
+    assert pick_worker({"codegame": 5, "level": 0}, 3) is None
+    assert not workers[2]["joined"]
+    assert pick_worker({"codegame": 8, "level": 0}, 3) == 2
+
+
+def test_pick_worker_second_join_rejected(fake_workers):
+    workers[2].update(busy=True, codegame=8)
+    assert pick_worker({"codegame": 8, "level": 0}, 3) == 2
+    assert pick_worker({"codegame": 8, "level": 0}, 3) is None
+
+
+def test_pick_worker_join_rejected_without_game(fake_workers):
+    assert pick_worker({"codegame": 8, "level": 0}, 3) is None
+    workers[2].update(busy=True, codegame=8)
+    workers[2]["process"].is_alive.return_value = False
+    assert pick_worker({"codegame": 8, "level": 0}, 3) is None
+
+
+def test_route_client_unknown_game(fake_workers):
+    conn = client_conn({"codegame": 8, "level": 0})
+    with patch("router.connect_worker") as mock_connect, patch("builtins.print"):
+        route_client(conn, ('127.0.0.1', 5000), 3)
+    mock_connect.assert_not_called()
+    assert pickle.loads(conn.sendall.call_args[0][0])["message"] == "@Game 8 not found, the game closed!"
+
+
+def test_pick_worker_new_game_takes_free_worker(fake_workers):
+    assert pick_worker({"codegame": 0, "level": 1}, 3) == 0
+    assert pick_worker({"codegame": "N", "level": 1}, 3) == 1
+    assert workers[0]["busy"] and workers[1]["busy"]
+
+
+def test_pick_worker_all_busy(fake_workers):
+    for worker in workers.values():
+        worker["busy"] = True
+    assert pick_worker({"codegame": 0, "level": 1}, 3) is None
+
+
+def test_pick_worker_restarts_finished_worker(fake_workers):
+    workers[0]["busy"] = True
+    workers[0]["process"].is_alive.return_value = False
+    with patch("router.start_worker", side_effect=lambda i, n: workers.update({i: fake_worker()})):
+        assert pick_worker({"codegame": 0, "level": 1}, 3) == 0
+
+
+def test_route_client_no_free_worker(fake_workers):
+    conn = client_conn({"codegame": 0, "level": 1})
+    with patch("router.pick_worker", return_value=None), patch("builtins.print"):
+        route_client(conn, ('127.0.0.1', 5000), 3)
+    assert pickle.loads(conn.sendall.call_args[0][0])["message"].startswith("@")
+
+
+def test_route_client_forwards_first_message(fake_workers):
+    first = pickle.dumps({"codegame": 5, "level": 0})
+    conn = client_conn({"codegame": 5, "level": 0})
+    conn.recv.side_effect = [first, b'']
+    upstream = context_mock()
+    upstream.recv.return_value = b''
+    workers[2].update(busy=True, codegame=5)
+    with patch("router.connect_worker", return_value=upstream) as mock_connect, patch("builtins.print"):
+        route_client(conn, ('127.0.0.1', 5000), 3)
+    mock_connect.assert_called_once_with(2)
+    upstream.sendall.assert_called_once_with(first)
+
+
+def test_route_client_unavailable_worker(fake_workers):
+    conn = client_conn({"codegame": 8, "level": 0})
+    workers[2].update(busy=True, codegame=8)
+    with patch("router.connect_worker", side_effect=OSError("refused")), \
+            patch("router.restart_worker") as mock_restart, patch("builtins.print"):
+        route_client(conn, ('127.0.0.1', 5000), 3)
+    mock_restart.assert_called_once_with(2, 3)
+    assert pickle.loads(conn.sendall.call_args[0][0])["message"] == "@Game 8 not found, the game closed!"
+
+
+# Тестирование сообщений рабочих процессов
+def test_watch_worker_records_code_and_restarts_after_game(fake_workers):
+    reports = context_mock()
+    reports.recv.side_effect = [("game", 7), ("closed", 0)]
+    workers[1].update(reports=reports, busy=True)
+    restarted = []
+    with patch("router.restart_worker", side_effect=lambda i, n: restarted.append((i, workers[i]["codegame"]))), \
+            patch("builtins.print"):
+        watch_worker(1, 3, reports)
+    assert restarted == [(1, 7)]
+
+
+def test_watch_worker_restarts_dead_worker(fake_workers):
+    reports = context_mock()
+    reports.recv.side_effect = EOFError
+    workers[0]["reports"] = reports
+    with patch("router.restart_worker") as mock_restart, patch("builtins.print"):
+        watch_worker(0, 3, reports)
+    mock_restart.assert_called_once_with(0, 3)
+
+
+def test_watch_worker_ignores_replaced_worker(fake_workers):
+    reports = context_mock()
+    reports.recv.side_effect = EOFError
+    with patch("router.restart_worker") as mock_restart:
+        watch_worker(0, 3, reports)
+    mock_restart.assert_not_called()
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="SIGUSR1 is not available on this platform")
+def test_router_ignores_profiling_signal(fake_workers):
+    with patch("router.start_worker"), patch("router.signal.signal") as mock_signal, \
+            patch("router.socket.socket", side_effect=OSError("no sockets")), patch("builtins.print"):
+        router.main(2)
+    mock_signal.assert_called_once_with(signal.SIGUSR1, signal.SIG_IGN)
@@ -1,11 +1,23 @@
+import os
+import math
+import signal
 import socket
 import pickle
 import threading
 import random
+from collections import deque
 from dfsmaze import dfsmaze_generate
+from mobs import as_mob_arrays, as_mob_list, blocked_mask, refresh_blocked, step_mobs
+from catalog import open_catalog, pick_level
+from profiling import profiled, profiled_section, profiling_active, start_profiling, stop_profiling
 
 HOST = '0.0.0.0'
 PORT = 65434
+WORKER_ID = 0
+WORKER_COUNT = 1
+CATALOG_PATH = 'levels.cat'
+MAX_STEPS = 100
+PROFILE_PATH = 'server.folded'
 lock = threading.Lock()
 
 game_state = {
@@ -23,17 +35,26 @@ game_state = {
 
 connections = {}
 
+senders = {}
 
-def generate_maze(level):
+mob_blocked = {"maze": None, "mask": None}
+
+level_catalog = {"data": None}
+
+router_pipe = {"conn": None}
+
+snapshot = {"version": 0, "state": None, "maze": None, "rows": None, "frame": None, "frame_version": -1}
+
+
+def build_level(level):
     """
-    Создает лабиринт для указанного уровня сложности.
-    В лабиринт входят: расстановка мобов, ключей, алмазов,
-    стартовая позиция игроков, выход и двери.
+    Создает лабиринт и мобов для указанного уровня сложности, не изменяя состояние игры.
+    В лабиринт входят: расстановка мобов, ключей, алмазов, старт, выход и двери.
 
     :param level: Уровень сложности (1, 2 или 3)
     :type level: int
-    :return: Лабиринт в виде двумерного списка
-    :rtype: list[list[str]]
+    :return: Лабиринт в виде двумерного списка и мобы в виде списка словарей {"x", "y", "d"}
+    :rtype: tuple[list[list[str]], list[dict]]
     :raises ValueError: Если передан неверный уровень сложности (не 1, 2 или 3)
     """
     if level not in [1, 2, 3]:
@@ -61,53 +82,131 @@ def generate_maze(level):
     maze[height - 2][width - 3] = " "
     maze[height - 3][width - 2] = " "
 
-    with lock:
-        m = []
-        for _ in range(mobs):
-            m.append({
-                "x": random.randint(2, width - 3),
-                "y": random.randint(2, height - 3),
-                "d": random.randint(-1, 1) or 1
-            })
-        game_state["mobs"] = m
-
-        for mb in game_state["mobs"]:
-            maze[mb["y"]][mb["x"]] = "M"
-
-        num_keys = random.randint(3, 5)
-        for _ in range(num_keys):
+    m = []
+    for _ in range(mobs):
+        m.append({
+            "x": random.randint(2, width - 3),
+            "y": random.randint(2, height - 3),
+            "d": random.randint(-1, 1) or 1
+        })
+
+    for mb in m:
+        maze[mb["y"]][mb["x"]] = "M"
+
+    num_keys = random.randint(3, 5)
+    for _ in range(num_keys):
+        key_x = random.randint(1, width - 2)
+        key_y = random.randint(1, height - 2)
+        while maze[key_y][key_x] != " ":
             key_x = random.randint(1, width - 2)
             key_y = random.randint(1, height - 2)
-            while maze[key_y][key_x] != " ":
-                key_x = random.randint(1, width - 2)
-                key_y = random.randint(1, height - 2)
-            maze[key_y][key_x] = "K"
+        maze[key_y][key_x] = "K"
 
-        door_positions = [(width - 3, height - 2), (width - 2, height - 3)]
-        for dx, dy in door_positions:
-            maze[dy][dx] = "\u2591"
+    door_positions = [(width - 3, height - 2), (width - 2, height - 3)]
+    for dx, dy in door_positions:
+        maze[dy][dx] = "\u2591"
 
-        num_gems = random.randint(3, 5)
-        for _ in range(num_gems):
+    num_gems = random.randint(3, 5)
+    for _ in range(num_gems):
+        gem_x = random.randint(1, width - 2)
+        gem_y = random.randint(1, height - 2)
+        while maze[gem_y][gem_x] != " ":
             gem_x = random.randint(1, width - 2)
             gem_y = random.randint(1, height - 2)
-            while maze[gem_y][gem_x] != " ":
-                gem_x = random.randint(1, width - 2)
-                gem_y = random.randint(1, height - 2)
-            maze[gem_y][gem_x] = "\u25C7"
+        maze[gem_y][gem_x] = "\u25C7"
+
+    return maze, m
+
+
+def get_catalog():
+    """
+    Возвращает каталог уровней из файла CATALOG_PATH, открывая его при первом обращении.
+
+    :return: Каталог, открытый функцией 'open_catalog', или None, если файла нет
+    :rtype: dict[str, numpy.ndarray] | None
+    """
+    if level_catalog["data"] is None and os.path.exists(CATALOG_PATH):
+        level_catalog["data"] = open_catalog(CATALOG_PATH)
+    return level_catalog["data"]
+
+
+def difficulty_band(difficulty):
+    """
+    Проверяет диапазон сложности, присланный клиентом.
+
+    :param difficulty: Значение поля "difficulty" из сообщения клиента
+    :type difficulty: object
+    :return: Пара (нижняя, верхняя граница) или None, если это не два конечных числа
+    :rtype: tuple[float, float] | None
+    """
+    if not isinstance(difficulty, (list, tuple)) or len(difficulty) != 2:
+        return None
+    for bound in difficulty:
+        if isinstance(bound, bool) or not isinstance(bound, (int, float)) or not math.isfinite(bound):
+            return None
+    return float(difficulty[0]), float(difficulty[1])
+
+
+@profiled
+def generate_maze(level, difficulty=None):
+    """
+    Создает лабиринт для указанного уровня сложности и готовит к нему состояние игры:
+    мобов, стартовые позиции игроков и код игры.
+    Если указан диапазон сложности и есть каталог уровней, лабиринт берется из каталога,
+    иначе генерируется заново.
+
+    :param level: Уровень сложности (1, 2 или 3)
+    :type level: int
+    :param difficulty: Диапазон сложности (нижняя, верхняя граница) для выбора уровня из каталога
+    :type difficulty: tuple[float, float] | None
+    :return: Лабиринт в виде двумерного списка
+    :rtype: list[list[str]]
+    :raises ValueError: Если передан неверный уровень сложности (не 1, 2 или 3)
+    """
+    if level not in [1, 2, 3]:
+        raise ValueError(f"Invalid level {level}. Valid levels are 1, 2 or 3.")
+
+    picked = None
+    band = difficulty_band(difficulty)
+    if band is not None and get_catalog() is not None:
+        picked = pick_level(get_catalog(), level, *band)
+    maze, m = picked or build_level(level)
+
+    with lock:
+        game_state["mobs"] = as_mob_arrays(m)
 
         game_state["players"][1]["x"] = 1
         game_state["players"][1]["y"] = 1
         game_state["players"][2]["x"] = 2
         game_state["players"][2]["y"] = 1
 
-        game_state["codegame"] = random.randint(1, 20)
+        game_state["codegame"] = WORKER_ID + WORKER_COUNT * random.randint(1, 20)
         game_state["level"] = level
         print(f'Code the game: {game_state["codegame"]}, level: {game_state["level"]}')
+        report_to_router("game", game_state["codegame"])
 
     return maze
 
 
+def report_to_router(event, codegame=0):
+    """
+    Сообщает маршрутизатору о событии игры, если сервер запущен его рабочим процессом.
+    Вызывается с захваченной блокировкой.
+
+    :param event: "game" - создана игра с кодом codegame; "closed" - игра окончена или ее создатель вышел
+    :type event: str
+    :param codegame: Код игры
+    :type codegame: int
+    :return: None
+    """
+    if router_pipe["conn"] is None:
+        return
+    try:
+        router_pipe["conn"].send((event, codegame))
+    except OSError as e:
+        print(f"Error: router is unavailable: {e}")
+
+
 def checkstep(x, y, player_id):
     """
     Проверяет возможность хода игрока.
@@ -139,6 +238,25 @@ def checkstep(x, y, player_id):
     return False
 
 
+def mobs_blocked_mask(changed):
+    """
+    Возвращает маску клеток, непроходимых для мобов, для текущего лабиринта.
+    Маска строится заново только для нового лабиринта, иначе обновляются лишь измененные клетки.
+
+    :param changed: Координаты клеток (x, y), которые мог изменить ход игрока
+    :type changed: list[tuple[int, int]]
+    :return: Булева маска размером (высота, ширина)
+    :rtype: numpy.ndarray
+    """
+    if mob_blocked["maze"] is not game_state["maze"]:
+        mob_blocked["maze"] = game_state["maze"]
+        mob_blocked["mask"] = blocked_mask(game_state["maze"])
+    else:
+        refresh_blocked(mob_blocked["mask"], game_state["maze"], changed)
+    return mob_blocked["mask"]
+
+
+@profiled
 def process_player_move(player_id, move):
     """
     Обрабатывает ход игрока.
@@ -149,75 +267,186 @@ def process_player_move(player_id, move):
     :type move: str
     :return: None
     """
-    global game_state
     with lock:
-        player = game_state["players"][player_id]
-        current_x, current_y = player["x"], player["y"]
-
-        if move == "up":
-            new_y, new_x = current_y - 1, current_x
-        elif move == "down":
-            new_y, new_x = current_y + 1, current_x
-        elif move == "left":
-            new_y, new_x = current_y, current_x - 1
-        elif move == "right":
-            new_y, new_x = current_y, current_x + 1
+        rows = set()
+        apply_move(player_id, move, rows)
+        publish_state(rows)
+
+
+@profiled
+def process_player_moves(player_id, moves):
+    """
+    Обрабатывает серию ходов игрока за один захват блокировки.
+    Каждый шаг выполняется по тем же правилам, что и 'process_player_move' (включая ход мобов).
+    Серия прерывается на первой клетке, куда пройти нельзя, или на первом событии
+    (ключ, алмаз, дверь, моб, выход). Выполняется не больше MAX_STEPS шагов.
+
+    :param player_id: Номер игрока
+    :type player_id: int
+    :param moves: Список (или кортеж) направлений или целевая клетка (x, y), до которой сервер строит путь
+    :type moves: list[str] | tuple[str, ...] | tuple[int, int]
+    :return: Количество выполненных шагов
+    :rtype: int
+    """
+    if is_target(moves):
+        moves = plan_path(player_id, moves)
+
+    with lock:
+        steps = 0
+        rows = set()
+        for move in moves[:MAX_STEPS]:
+            steps += 1
+            if not apply_move(player_id, move, rows):
+                break
+        publish_state(rows)
+        return steps
+
+
+def is_target(moves):
+    """
+    Проверяет, прислал ли игрок целевую клетку, а не серию ходов.
+
+    :param moves: Серия ходов или целевая клетка
+    :type moves: list | tuple
+    :return: True, если это кортеж из двух целых чисел (x, y)
+    :rtype: bool
+    """
+    return isinstance(moves, tuple) and len(moves) == 2 \
+        and all(isinstance(v, int) and not isinstance(v, bool) for v in moves)
+
+
+def plan_path(player_id, target):
+    """
+    Строит путь игрока до целевой клетки по последнему опубликованному снимку состояния.
+    Поиск идет без блокировки, поэтому не задерживает ходы других игроков.
+    Если до захвата блокировки лабиринт успел измениться, путь может устареть:
+    каждый шаг все равно проверяется при выполнении, и серия прерывается на первом недоступном.
+
+    :param player_id: Номер игрока
+    :type player_id: int
+    :param target: Целевая клетка (x, y)
+    :type target: tuple[int, int]
+    :return: Список направлений; пустой, если пути нет
+    :rtype: list[str]
+    """
+    state = snapshot["state"]
+    if state is None or state["maze"] is None or player_id not in state["players"]:
+        return []
+    player = state["players"][player_id]
+    return find_path(state["maze"], (player["x"], player["y"]), target)
+
+
+def find_path(maze, start, target):
+    """
+    Ищет кратчайший путь до целевой клетки (поиск в ширину).
+    Путь проходит только через свободные клетки, ключи, алмазы и выход:
+    двери, мобы и другой игрок считаются препятствиями.
+
+    :param maze: Лабиринт в виде двумерного списка
+    :type maze: list[list[str]]
+    :param start: Начальная клетка (x, y)
+    :type start: tuple[int, int]
+    :param target: Целевая клетка (x, y)
+    :type target: tuple[int, int]
+    :return: Список направлений; пустой, если пути нет
+    :rtype: list[str]
+    """
+    steps = {"up": (0, -1), "down": (0, 1), "left": (-1, 0), "right": (1, 0)}
+    came_from = {tuple(start): None}
+    queue = deque([tuple(start)])
+    target = tuple(target)
+    while queue and target not in came_from:
+        x, y = queue.popleft()
+        for move, (dx, dy) in steps.items():
+            nx, ny = x + dx, y + dy
+            if (nx, ny) not in came_from and 0 <= ny < len(maze) and 0 <= nx < len(maze[0]) \
+                    and maze[ny][nx] in [" ", "E", "K", "\u25C7"]:
+                came_from[(nx, ny)] = (x, y), move
+                queue.append((nx, ny))
+
+    if target not in came_from:
+        return []
+    path = []
+    cell = target
+    while came_from[cell] is not None:
+        cell, move = came_from[cell]
+        path.append(move)
+    return path[::-1]
+
+
+def apply_move(player_id, move, rows=None):
+    """
+    Выполняет один ход игрока и ход мобов. Вызывается с захваченной блокировкой.
+
+    :param player_id: Номер игрока
+    :type player_id: int
+    :param move: Направление хода ("up", "down", "left", "right")
+    :type move: str
+    :param rows: Множество, в которое добавляются номера измененных строк лабиринта
+    :type rows: set[int] | None
+    :return: True, если игрок сдвинулся и ничего не произошло; иначе False
+    :rtype: bool
+    """
+    global game_state
+    player = game_state["players"][player_id]
+    current_x, current_y = player["x"], player["y"]
+
+    if move == "up":
+        new_y, new_x = current_y - 1, current_x
+    elif move == "down":
+        new_y, new_x = current_y + 1, current_x
+    elif move == "left":
+        new_y, new_x = current_y, current_x - 1
+    elif move == "right":
+        new_y, new_x = current_y, current_x + 1
+    else:
+        return False
+
+    target_x, target_y = new_x, new_y
+    game_state["message"] = ""
+
+    if game_state["maze"][new_y][new_x] == "M":
+        player["lives"] -= 1
+        print(f"Player {player_id} hit a mob! Lives left: {player['lives']}")
+        game_state["message"] = f"!Player {player_id} hit a mob! Lives left: {player['lives']}"
+        game_state["maze"][current_y][current_x] = " "
+        player["x"], player["y"] = 1, 1
+        new_y, new_x = 1, 1
+        game_state["maze"][1][1] = str(player_id)
+        if player["lives"] == 0:
+            print(f"Player {player_id} lost! The other player is winner!")
+            game_state["message"] = f"@Player {player_id} lost! The other player is winner!"
+
+    if game_state["maze"][new_y][new_x] == "K":
+        player["keys"] += 1
+        print(f"Player {player_id} picked up a key! Total keys: {player['keys']}")
+        game_state["message"] = f"!Player {player_id} picked up a key! Total keys: {player['keys']}"
+        game_state["maze"][new_y][new_x] = " "
+
+    if game_state["maze"][new_y][new_x] == "\u25C7":
+        player["gems"] += 1
+        print(f"Player {player_id} picked up a gem!!!! Total gems: {player['gems']}")
+        game_state["message"] = f"!Player {player_id} picked up a gem!!!! Total gems: {player['gems']}"
+        game_state["maze"][new_y][new_x] = " "
+
+    moved = checkstep(new_x, new_y, player_id)
+    if moved:
+        game_state["maze"][current_y][current_x] = " "
+        player["x"], player["y"] = new_x, new_y
+
+        if game_state["maze"][new_y][new_x] != "E":
+            game_state["maze"][new_y][new_x] = str(player_id)
         else:
-            return
-
-        game_state["message"] = ""
-
-        if game_state["maze"][new_y][new_x] == "M":
-            player["lives"] -= 1
-            print(f"Player {player_id} hit a mob! Lives left: {player['lives']}")
-            game_state["message"] = f"!Player {player_id} hit a mob! Lives left: {player['lives']}"
-            game_state["maze"][current_y][current_x] = " "
-            player["x"], player["y"] = 1, 1
-            new_y, new_x = 1, 1
-            game_state["maze"][1][1] = str(player_id)
-            if player["lives"] == 0:
-                print(f"Player {player_id} lost! The other player is winner!")
-                game_state["message"] = f"@Player {player_id} lost! The other player is winner!"
-
-        if game_state["maze"][new_y][new_x] == "K":
-            player["keys"] += 1
-            print(f"Player {player_id} picked up a key! Total keys: {player['keys']}")
-            game_state["message"] = f"!Player {player_id} picked up a key! Total keys: {player['keys']}"
-            game_state["maze"][new_y][new_x] = " "
-
-        if game_state["maze"][new_y][new_x] == "\u25C7":
-            player["gems"] += 1
-            print(f"Player {player_id} picked up a gem!!!! Total gems: {player['gems']}")
-            game_state["message"] = f"!Player {player_id} picked up a gem!!!! Total gems: {player['gems']}"
-            game_state["maze"][new_y][new_x] = " "
-
-        if checkstep(new_x, new_y, player_id):
-            game_state["maze"][current_y][current_x] = " "
-            player["x"], player["y"] = new_x, new_y
-
-            if game_state["maze"][new_y][new_x] != "E":
-                game_state["maze"][new_y][new_x] = str(player_id)
-            else:
-                print(f"Player {player_id} has exited the maze! Game over!")
-                game_state["message"] = f"@Player {player_id} has escaped the maze! Game over!"
-
-        for m in range(len(game_state["mobs"])):
-            mob = game_state["mobs"][m]
-            mob_y, mob_x = mob["y"], mob["x"]
-
-            if 0 <= mob_y < len(game_state["maze"]) and 0 <= mob_x < len(game_state["maze"][0]):
-                game_state["maze"][mob_y][mob_x] = " "
-
-            new_mob_x = mob_x + mob["d"]
-
-            if 0 <= mob_y < len(game_state["maze"]) and 0 <= new_mob_x < len(game_state["maze"][0]) and \
-                    game_state["maze"][mob_y][new_mob_x] not in ["\u2588", "\u2591", "\u25C7", "K"]:
-                mob["x"] = new_mob_x
-            else:
-                mob["d"] *= -1
-
-            if 0 <= mob_y < len(game_state["maze"]) and 0 <= mob["x"] < len(game_state["maze"][0]):
-                game_state["maze"][mob_y][mob["x"]] = "M"
+            print(f"Player {player_id} has exited the maze! Game over!")
+            game_state["message"] = f"@Player {player_id} has escaped the maze! Game over!"
+
+    mob_rows = step_mobs(game_state["maze"], game_state["mobs"],
+                         mobs_blocked_mask([(current_x, current_y), (target_x, target_y), (1, 1)]))
+    if rows is not None:
+        rows.update((current_y, target_y, 1))
+        rows.update(mob_rows)
+
+    return moved and not game_state["message"]
 
 
 def handle_client(conn, addr, player_id):
@@ -226,7 +455,8 @@ def handle_client(conn, addr, player_id):
     Эта функция запускается в отдельном потоке для каждого подключившегося клиента. Она выполняет следующие шаги:
     1. Отправляет начальное состояние игры клиенту.
     2. Получает данные от клиента (например, ход игрока или другие команды).
-    3. Обрабатывает полученный ход игрока с помощью функции 'process_player_move'.
+    3. Обрабатывает полученный ход игрока с помощью функции 'process_player_move'
+       (серию ходов или целевую клетку - с помощью 'process_player_moves').
     4. Генерирует лабиринт для первого подключившегося игрока, если это необходимо.
     5. Проверяет правильность кода игры, и если код неправильный, завершает игру и выводит сообщение.
     6. Рассылает обновленное состояние игры всем клиентам с помощью функции 'broadcast_game_state'.
@@ -244,25 +474,29 @@ def handle_client(conn, addr, player_id):
     global game_state
     print(f"Player {player_id} connected from {addr}")
     try:
-        conn.sendall(pickle.dumps(game_state))
+        send_frame(conn, *current_frame())
         while True:
             raw_data = conn.recv(4096)
             if not raw_data:
                 print(f"Player {player_id} disconnected.")
                 break
 
-            move = pickle.loads(raw_data)
+            with profiled_section():
+                move = pickle.loads(raw_data)
 
-            if game_state["maze"] is None and game_state["codegame"] == 0:
-                game_state["maze"] = generate_maze(move["level"])
-            elif not isinstance(move, str) and int(game_state["codegame"]) != int(move["codegame"]):
-                print(f"Received wrong code the game {player_id}")
-                game_state["message"] = f'@Player {player_id} inserted wrong code:{move["codegame"]}, the game closed!'
-                break
+                if game_state["maze"] is None and game_state["codegame"] == 0:
+                    game_state["maze"] = generate_maze(move["level"], move.get("difficulty"))
+                elif isinstance(move, dict) and int(game_state["codegame"]) != int(move["codegame"]):
+                    print(f"Received wrong code the game {player_id}")
+                    game_state["message"] = f'@Player {player_id} inserted wrong code:{move["codegame"]}, the game closed!'
+                    break
 
-            print(f"Received move from Player {player_id}: {move}")
-            process_player_move(player_id, move)
-            broadcast_game_state()
+                print(f"Received move from Player {player_id}: {move}")
+                if isinstance(move, (list, tuple)):
+                    process_player_moves(player_id, move)
+                else:
+                    process_player_move(player_id, move)
+                broadcast_game_state()
 
     except Exception as e:
         print(f"Error with Player {player_id}: {e}")
@@ -272,9 +506,94 @@ def handle_client(conn, addr, player_id):
         conn.close()
         with lock:
             del connections[player_id]
+            senders.pop(conn, None)
+            if player_id == 1 or game_state["message"].startswith("@"):
+                report_to_router("closed")
             print(f"Player {player_id} removed.")
 
 
+def publish_state(rows=None):
+    """
+    Публикует неизменяемый снимок состояния игры с новым номером версии.
+    Вызывается с захваченной блокировкой после каждого изменения состояния.
+    Строки лабиринта копируются только измененные, остальные берутся из предыдущего снимка,
+    поэтому время под блокировкой не зависит от размера лабиринта.
+
+    :param rows: Номера измененных строк лабиринта; None - скопировать лабиринт целиком
+    :type rows: Iterable[int] | None
+    :return: None
+    """
+    maze = game_state["maze"]
+    if maze is None:
+        snapshot["maze"], snapshot["rows"] = None, None
+    elif rows is None or snapshot["maze"] is not maze:
+        snapshot["maze"], snapshot["rows"] = maze, [row[:] for row in maze]
+    else:
+        for y in rows:
+            if 0 <= y < len(maze):
+                snapshot["rows"][y] = maze[y][:]
+
+    state = dict(game_state)
+    state["maze"] = None if maze is None else list(snapshot["rows"])
+    state["players"] = {player_id: dict(player) for player_id, player in game_state["players"].items()}
+    state["items"] = list(game_state["items"])
+    if game_state["mobs"] is not None:
+        state["mobs"] = as_mob_list(game_state["mobs"])
+
+    snapshot["version"] += 1
+    snapshot["state"] = state
+
+
+def current_frame():
+    """
+    Возвращает последний опубликованный снимок состояния игры в сериализованном виде вместе с его версией.
+    Снимок кодируется вне блокировки и один раз на версию: новые игроки и рассылки
+    получают один и тот же кэшированный кадр.
+
+    :return: Версия снимка и снимок, сериализованный pickle
+    :rtype: tuple[int, bytes]
+    """
+    with lock:
+        if snapshot["state"] is None:
+            publish_state()
+        if snapshot["frame_version"] == snapshot["version"]:
+            return snapshot["frame_version"], snapshot["frame"]
+        version, state = snapshot["version"], snapshot["state"]
+
+    frame = pickle.dumps(state)
+
+    with lock:
+        if version > snapshot["frame_version"]:
+            snapshot["frame"], snapshot["frame_version"] = frame, version
+    return version, frame
+
+
+def send_frame(conn, version, frame):
+    """
+    Отправляет кадр состояния в соединение.
+    Отправки в одно соединение выполняются по очереди, а кадр старше уже отправленного
+    в это соединение отбрасывается, чтобы клиент не вернулся к старому состоянию.
+
+    :param conn: Сетевое соединение с клиентом
+    :type conn: socket.socket
+    :param version: Версия снимка
+    :type version: int
+    :param frame: Снимок, сериализованный pickle
+    :type frame: bytes
+    :return: True, если кадр отправлен; False, если он устарел
+    :rtype: bool
+    """
+    with lock:
+        sender = senders.setdefault(conn, {"lock": threading.Lock(), "version": -1})
+    with sender["lock"]:
+        if version <= sender["version"]:
+            return False
+        conn.sendall(frame)
+        sender["version"] = version
+        return True
+
+
+@profiled
 def broadcast_game_state():
     """
     Отправляет обновленное состояние игры всем подключенным игрокам.
@@ -283,32 +602,65 @@ def broadcast_game_state():
     :return: None
     :raises Exception: Ошибка отправки данных клиенту.
     """
+    version, data = current_frame()
     with lock:
-        data = pickle.dumps(game_state)
-        for player_id, conn in connections.items():
-            try:
-                conn.sendall(data)
-            except Exception as e:
-                print(f"Error sending to Player {player_id}: {e}")
+        targets = list(connections.items())
+    for player_id, conn in targets:
+        try:
+            send_frame(conn, version, data)
+        except Exception as e:
+            print(f"Error sending to Player {player_id}: {e}")
 
 
-def main():
+def toggle_profiling(signum=None, frame=None):
+    """
+    Включает или выключает профилирование работающего сервера (обработчик сигнала SIGUSR1).
+    Профилируются обработка сообщений клиентов, ходы, генерация лабиринта и рассылка состояния,
+    причем только для игры, которая идет в момент включения.
+    При выключении профиль сохраняется в файл PROFILE_PATH в формате collapsed stacks.
+
+    :param signum: Номер сигнала
+    :type signum: int | None
+    :param frame: Текущий кадр стека
+    :type frame: types.FrameType | None
+    :return: None
+    """
+    if profiling_active():
+        path = stop_profiling(PROFILE_PATH)
+        print(f"Profiling stopped, saved to {path}" if path else "Profiling stopped, nothing recorded")
+        return
+
+    codegame = game_state["codegame"]
+    start_profiling((lambda: game_state["codegame"] == codegame) if codegame else None)
+    print(f"Profiling started for game {codegame}" if codegame else "Profiling started")
+
+
+def main(host=HOST, port=PORT):
     """
     Основная функция для запуска сервера игры. Она:
     1. Инициализирует сокет для приема TCP-соединений.
-    2. Прослушивает указанный адрес (HOST) и порт (PORT).
+    2. Прослушивает указанный адрес и порт (по умолчанию HOST и PORT).
     3. Ждет подключения двух игроков.
     4. Запускает обработку каждого игрока в отдельном потоке.
     5. Завершает ожидание после подключения двух игроков и стартует игровой процесс.
+    Если платформа поддерживает сигнал SIGUSR1, он включает и выключает профилирование ('toggle_profiling').
 
+    :param host: Адрес, на котором сервер принимает подключения
+    :type host: str
+    :param port: Порт, на котором сервер принимает подключения
+    :type port: int
     :return: None
     :raises socket.error: Если не удалось создать сокет или привязать его к указанному адресу и порту.
     """
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, toggle_profiling)
+
     try:
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.bind((HOST, PORT))
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            s.bind((host, port))
             s.listen(2)
-            print(f"Server listening on {HOST}:{PORT}")
+            print(f"Server listening on {host}:{port} (pid {os.getpid()})")
 
             player_id = 1
             while player_id <= 2:
@@ -1,17 +1,28 @@
 import pytest
 import pickle
+import random
+import threading
 from unittest.mock import Mock, patch, call
 from server import (
     generate_maze,
     game_state,
     checkstep,
     process_player_move,
+    process_player_moves,
+    find_path,
+    publish_state,
+    current_frame,
+    snapshot,
+    send_frame,
     broadcast_game_state,
     handle_client,
     connections,
+    router_pipe,
+    lock as server_lock,
     main,
 )
 import socket
+from mobs import as_mob_arrays, blocked_mask, step_mobs_loop, step_mobs_vector
 
 
 # Тестирование функции checkstep
@@ -75,7 +86,7 @@ def fixed_game():
     game_state["players"] = {
         1: {"x": 1, "y": 1, "lives": 3, "keys": 0, "gems": 0},
     }
-    game_state["mobs"] = [{"x": 1, "y": 2, "d": 1}]
+    game_state["mobs"] = as_mob_arrays([{"x": 1, "y": 2, "d": 1}])
     game_state["message"] = ""
 
 
@@ -120,6 +131,7 @@ def reset_game_state():
     game_state["level"] = 0
     game_state["codegame"] = 0
     game_state["message"] = ""
+    publish_state()
 
 
 @pytest.fixture
@@ -168,6 +180,23 @@ def test_invalid_game_code(mock_socket, reset_game_state, mock_connections):
     mock_socket.close.assert_called_once()
 
 
+@pytest.mark.parametrize("player_id, message, closed", [
+    (1, "", True),
+    (2, "", False),
+    (2, "@Player 2 has escaped the maze! Game over!", True),
+])
+def test_game_reported_to_router(mock_socket, reset_game_state, mock_connections, player_id, message, closed):
+    mock_socket.recv.side_effect = [pickle.dumps({"codegame": 0, "level": 1}), b'']
+    connections[player_id] = mock_socket
+    reports = Mock()
+    finish = lambda *args: game_state.update(message=message)
+    with patch.dict(router_pipe, {"conn": reports}), patch("server.process_player_move", side_effect=finish), \
+            patch("server.broadcast_game_state"), patch("builtins.print"):
+        handle_client(mock_socket, ('127.0.0.1', 65434), player_id)
+    assert reports.send.call_args_list[0] == call(("game", game_state["codegame"]))
+    assert (call(("closed", 0)) in reports.send.call_args_list) == closed
+
+
 def test_handle_client_with_unexpected_exception(mock_socket, reset_game_state):
     mock_socket.recv.side_effect = Exception("Unexpected error during receiving data")
     connections[1] = mock_socket
@@ -229,6 +258,7 @@ def test_main_function_successful(mock_thread_start, mock_socket):
     with patch("builtins.print"):
         main()
     mock_socket.assert_called_once_with(socket.AF_INET, socket.SOCK_STREAM)
+    mock_socket_instance.setsockopt.assert_called_once_with(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     mock_socket_instance.bind.assert_called_once_with(('0.0.0.0', 65434))
     mock_socket_instance.listen.assert_called_once_with(2)
     assert mock_socket_instance.accept.call_count == 2
@@ -241,3 +271,217 @@ def test_main_function_socket_creation_failure(mock_socket):
     with patch("builtins.print") as mock_print:
         main()
         mock_print.assert_called_with("Error: Failed to create socket: Failed to create socket")
+
+
+# Тестирование движения мобов
+def legacy_mob_step(maze, mobs):
+    for mob in mobs:
+        mob_y, mob_x = mob["y"], mob["x"]
+        if 0 <= mob_y < len(maze) and 0 <= mob_x < len(maze[0]):
+            maze[mob_y][mob_x] = " "
+        new_mob_x = mob_x + mob["d"]
+        if 0 <= mob_y < len(maze) and 0 <= new_mob_x < len(maze[0]) and \
+                maze[mob_y][new_mob_x] not in ["\u2588", "\u2591", "\u25C7", "K"]:
+            mob["x"] = new_mob_x
+        else:
+            mob["d"] *= -1
+        if 0 <= mob_y < len(maze) and 0 <= mob["x"] < len(maze[0]):
+            maze[mob_y][mob["x"]] = "M"
+
+
+@pytest.mark.parametrize("step", [step_mobs_loop, step_mobs_vector])
+@pytest.mark.parametrize("seed", range(5))
+def test_mobs_match_sequential_update(step, seed):
+    random.seed(seed)
+    maze = [[random.choice(["\u2588", " ", " ", " ", "K", "\u2591", "\u25C7"]) for _ in range(12)]
+            for _ in range(8)]
+    mobs = [{"x": random.randint(0, 11), "y": random.randint(0, 7), "d": random.choice([-1, 1])}
+            for _ in range(40)]
+    for mob in mobs:
+        maze[mob["y"]][mob["x"]] = "M"
+    vector_maze = [row[:] for row in maze]
+    vector_mobs = as_mob_arrays(mobs)
+    mask = blocked_mask(vector_maze)
+
+    for _ in range(10):
+        before = [row[:] for row in vector_maze]
+        rows = step(vector_maze, vector_mobs, mask)
+        legacy_mob_step(maze, mobs)
+        assert vector_maze == maze
+        assert {y for y, row in enumerate(maze) if before[y] != row} <= rows
+        assert vector_mobs["x"].tolist() == [mob["x"] for mob in mobs]
+        assert vector_mobs["d"].tolist() == [mob["d"] for mob in mobs]
+
+
+def test_mob_turns_at_wall(fixed_game):
+    process_player_move(1, "diagonally")
+    process_player_move(1, "up")
+    assert game_state["mobs"]["x"].tolist() == [2]
+    assert game_state["maze"][2][2] == "M"
+    process_player_move(1, "up")
+    assert game_state["mobs"]["x"].tolist() == [2]
+    assert game_state["mobs"]["d"].tolist() == [-1]
+
+
+# Тестирование серии ходов
+@pytest.fixture
+def corridor_game():
+    game_state["maze"] = [
+        ["\u2588", "\u2588", "\u2588", "\u2588", "\u2588", "\u2588", "\u2588"],
+        ["\u2588", "1", " ", " ", "\u25C7", " ", "\u2588"],
+        ["\u2588", " ", "\u2588", "\u2588", "\u2588", " ", "\u2588"],
+        ["\u2588", " ", " ", " ", " ", " ", "\u2588"],
+        ["\u2588", "\u2588", "\u2588", "\u2588", "\u2588", "\u2588", "\u2588"]
+    ]
+    game_state["players"] = {
+        1: {"x": 1, "y": 1, "lives": 3, "keys": 0, "gems": 0},
+    }
+    game_state["mobs"] = as_mob_arrays([])
+    game_state["message"] = ""
+    publish_state()
+
+
+def test_moves_batch_stops_at_event(corridor_game):
+    assert process_player_moves(1, ["right", "right", "right", "right"]) == 3
+    assert (game_state["players"][1]["x"], game_state["players"][1]["y"]) == (4, 1)
+    assert game_state["players"][1]["gems"] == 1
+
+
+def test_moves_batch_stops_at_wall(corridor_game):
+    assert process_player_moves(1, ["down", "right", "down"]) == 2
+    assert (game_state["players"][1]["x"], game_state["players"][1]["y"]) == (1, 2)
+
+
+def test_moves_batch_limited(corridor_game):
+    with patch("server.MAX_STEPS", 1):
+        assert process_player_moves(1, ["down", "down"]) == 1
+    assert game_state["players"][1]["y"] == 2
+
+
+def test_moves_to_target(corridor_game):
+    assert process_player_moves(1, (5, 3)) == 6
+    assert (game_state["players"][1]["x"], game_state["players"][1]["y"]) == (5, 3)
+    assert game_state["maze"][3][5] == "1"
+
+
+def test_moves_tuple_of_directions_is_batch(corridor_game):
+    assert process_player_moves(1, ("right", "right")) == 2
+    assert (game_state["players"][1]["x"], game_state["players"][1]["y"]) == (3, 1)
+
+
+@pytest.mark.parametrize("moves", [(5, 3, 1), (5.0, 3), (True, 1), ("5", "3")])
+def test_moves_malformed_target_is_not_a_path(corridor_game, moves):
+    with patch("server.find_path") as mock_find_path:
+        process_player_moves(1, moves)
+    mock_find_path.assert_not_called()
+    assert (game_state["players"][1]["x"], game_state["players"][1]["y"]) == (1, 1)
+
+
+def test_path_planned_outside_lock(corridor_game):
+    def check_unlocked(*args):
+        assert not server_lock.locked()
+        return ["down"]
+
+    with patch("server.find_path", side_effect=check_unlocked):
+        assert process_player_moves(1, (1, 2)) == 1
+    assert game_state["players"][1]["y"] == 2
+
+
+def test_find_path_unreachable(corridor_game):
+    assert find_path(game_state["maze"], (1, 1), (2, 2)) == []
+
+
+def test_handle_client_moves_batch(mock_socket, reset_game_state, mock_connections):
+    game_state["maze"] = generate_maze(1)
+    mock_socket.recv.side_effect = [pickle.dumps(["down", "down"]), b'']
+    connections[1] = mock_socket
+    with patch("server.process_player_moves") as mock_process_moves:
+        handle_client(mock_socket, ('0.0.0.0', 65434), 1)
+        mock_process_moves.assert_called_once_with(1, ["down", "down"])
+
+
+# Тестирование снимков состояния
+def test_snapshot_encoded_once_per_version(reset_game_state):
+    with patch("server.pickle.dumps", wraps=pickle.dumps) as mock_dumps:
+        first = current_frame()[1]
+        assert current_frame()[1] is first
+    mock_dumps.assert_called_once()
+
+
+def test_snapshot_not_changed_by_later_moves(corridor_game):
+    publish_state()
+    before = current_frame()[1]
+    process_player_move(1, "right")
+    assert pickle.loads(before)["maze"][1][1] == "1"
+    after = pickle.loads(current_frame()[1])
+    assert after["maze"][1][1] == " "
+    assert after["maze"][1][2] == "1"
+    assert after["maze"] == game_state["maze"]
+    assert after["players"] == game_state["players"]
+
+
+def test_snapshot_sends_mobs_as_dicts(fixed_game):
+    publish_state()
+    assert pickle.loads(current_frame()[1])["mobs"] == [{"x": 1, "y": 2, "d": 1}]
+    assert b"numpy" not in current_frame()[1]
+
+
+def test_snapshot_copies_only_changed_rows(corridor_game):
+    publish_state()
+    old_maze = snapshot["state"]["maze"]
+    process_player_move(1, "right")
+    new_maze = snapshot["state"]["maze"]
+    assert new_maze == game_state["maze"]
+    assert new_maze[1] is not old_maze[1]
+    assert new_maze[3] is old_maze[3]
+
+
+def test_snapshot_skips_rows_of_stuck_mobs(corridor_game):
+    game_state["maze"][2][3] = "M"
+    game_state["mobs"] = as_mob_arrays([{"x": 3, "y": 2, "d": 1}])
+    publish_state()
+    old_maze = snapshot["state"]["maze"]
+    process_player_move(1, "right")
+    assert snapshot["state"]["mobs"] == [{"x": 3, "y": 2, "d": -1}]
+    assert snapshot["state"]["maze"][2] is old_maze[2]
+
+
+def test_send_frame_drops_older_version():
+    conn = Mock()
+    assert send_frame(conn, 5, b"new") is True
+    assert send_frame(conn, 4, b"old") is False
+    assert send_frame(conn, 5, b"new") is False
+    conn.sendall.assert_called_once_with(b"new")
+
+
+def test_concurrent_broadcasts_do_not_interleave(mock_connections):
+    received = []
+    active = {"count": 0, "max": 0}
+    sending = threading.Event()
+    release = threading.Event()
+
+    class BlockingConn:
+        def sendall(self, data):
+            active["count"] += 1
+            active["max"] = max(active["max"], active["count"])
+            if not received:
+                sending.set()
+                assert release.wait(5)
+            received.append(pickle.loads(data)["message"])
+            active["count"] -= 1
+
+    connections[1] = BlockingConn()
+    game_state["message"] = "first"
+    publish_state()
+    first = threading.Thread(target=broadcast_game_state)
+    first.start()
+    assert sending.wait(5)
+    game_state["message"] = "second"
+    publish_state()
+    second = threading.Thread(target=broadcast_game_state)
+    second.start()
+    release.set()
+    first.join()
+    second.join()
+    assert active["max"] == 1
+    assert received == ["first", "second"]